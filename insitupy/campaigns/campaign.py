@@ -1,7 +1,12 @@
 """
 Point data from select manual measurement campaigns
 """
+import io
 import logging
+import os
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
 from pathlib import Path
 import geopandas as gpd
 from typing import List
@@ -78,6 +83,14 @@ class ProfileData:
     """
     VARIABLES = ProfileVariables
     META_PARSER = MetaDataParser
+    # Avoid a __dict__ per profile for large collections
+    __slots__ = (
+        "_depth_layer", "_lower_depth_layer", "_metadata", "variable",
+        "_column_mappings", "_measurements_to_keep", "_id", "_dt", "_gdf",
+        "_layer_average", "_mean", "_total_depth", "_df",
+        "_non_measure_columns", "_sample_columns", "_has_layers",
+        "_multi_sample",
+    )
 
     def __init__(
         self, input_df, metadata: ProfileMetaData, variable: MeasurementDescription,
@@ -105,6 +118,12 @@ class ProfileData:
         self._id = metadata.id
         self._dt = metadata.date_time
 
+        # Lazily computed geo dataframe and statistics of the profile
+        self._gdf = None
+        self._layer_average = None
+        self._mean = None
+        self._total_depth = None
+
         # This will populate the column mapping
         self._df = self._format_df(input_df)
 
@@ -116,11 +135,12 @@ class ProfileData:
         _non_measure_columns = [
             self._depth_layer.code, self._lower_depth_layer.code,
             "datetime",
-            "geometry"
         ]
         self._non_measure_columns = [
             c for c in _non_measure_columns if c in columns
         ]
+        # geometry is added when the geo dataframe is built
+        self._non_measure_columns.append("geometry")
 
         # Columns related to the variable
         self._sample_columns = [
@@ -143,42 +163,44 @@ class ProfileData:
 
         # Get rid of columns we don't want and populate column mapping
         columns = input_df.columns.values
-        for c in columns:
-            cn, cm = self.VARIABLES.from_mapping(c)
-            # join with existing mappings
-            self._column_mappings = {**cm, **self._column_mappings}
+        self._column_mappings = {
+            c: self.VARIABLES.get_description(c) for c in columns
+        }
 
         columns_to_keep = [
-            c for c in columns
-            if self._column_mappings[c] in self._measurements_to_keep
+            c for c, m in self._column_mappings.items()
+            if m in self._measurements_to_keep
         ]
         df = input_df.loc[:, columns_to_keep]
 
-        n_entries = len(df)
-        df["datetime"] = [self._dt] * n_entries
-
-        # parse the location
-        lat, lon = self.latlon
-        location = gpd.points_from_xy(
-            [lon] * n_entries, [lat] * n_entries
-        )
+        # Mask the no data value, only numeric columns can hold it
+        numeric_columns = df.select_dtypes(include="number").columns
+        values = df[numeric_columns].to_numpy(dtype=np.float64)
+        no_data = values == -9999
+        # Only write back columns with no data so the others keep their dtype
+        hit = no_data.any(axis=0)
+        if hit.any():
+            values[no_data] = np.nan
+            df[numeric_columns[hit]] = values[:, hit]
 
-        df = gpd.GeoDataFrame(
-            df, geometry=location
-        ).set_crs("EPSG:4326")
-        df = df.replace(-9999, np.NaN)
+        # broadcast the scalar, this keeps the timezone aware dtype
+        df["datetime"] = self._dt
 
         return df
 
     def _extend_df(self):
         # set the thickness of the layer
         if self._has_layers:
-            self._df[self.VARIABLES.LAYER_THICKNESS.code] = (
-                self._df[self._depth_layer.code] - self._df[
-                    self._lower_depth_layer.code
-                ]
+            # columns share an index, so skip the pandas alignment
+            self._df[self.VARIABLES.LAYER_THICKNESS.code] = np.subtract(
+                self._df[self._depth_layer.code].to_numpy(),
+                self._df[self._lower_depth_layer.code].to_numpy()
             )
 
+    @property
+    def metadata(self):
+        return self._metadata
+
     @property
     def latlon(self):
         # return location metadata
@@ -186,7 +208,37 @@ class ProfileData:
 
     @property
     def df(self):
-        return self._df
+        """
+        GeoDataFrame of the profile. The point geometry is only built
+        the first time this is accessed
+        """
+        if self._gdf is None:
+            n_entries = len(self._df)
+            # parse the location
+            lat, lon = self.latlon
+            location = gpd.points_from_xy(
+                np.full(n_entries, lon, dtype=np.float64),
+                np.full(n_entries, lat, dtype=np.float64)
+            )
+            self._gdf = gpd.GeoDataFrame(
+                self._df, geometry=location
+            ).set_crs("EPSG:4326")
+        return self._gdf
+
+    @property
+    def layer_average(self):
+        """
+        Average of the sample columns for each layer. Computed once
+        """
+        if self._layer_average is None:
+            values = self._df.loc[:, self._sample_columns].to_numpy(
+                dtype=np.float64
+            )
+            # Layers without any samples are expected to be nan
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore", category=RuntimeWarning)
+                self._layer_average = np.nanmean(values, axis=1)
+        return self._layer_average
 
     @property
     def sum(self):
@@ -196,8 +248,9 @@ class ProfileData:
             raise RuntimeError("Cannot compute for no layers")
 
         # this should work for multi or not multi sample
-        profile_average = self._df.loc[:, self._sample_columns].mean(axis=1)
-        self._df["mean"] = profile_average
+        self._df["mean"] = self.layer_average
+        # rebuild the geo dataframe with the new column
+        self._gdf = None
         # TODO: sum up with depth change
         # TODO: could we use the weighted mean * the total depth?
         # TODO: units
@@ -205,37 +258,43 @@ class ProfileData:
 
     @property
     def mean(self):
-        profile_average = self._df.loc[:, self._sample_columns].mean(
-            axis=1)
-        if pd.isna(profile_average).all():
+        if self._mean is None:
+            self._mean = self._compute_mean()
+        return self._mean
+
+    def _compute_mean(self):
+        profile_average = self.layer_average
+        if np.isnan(profile_average).all():
             return np.nan
         if self._has_layers:
             # height weighted mean for these layers
-            thickness = self._df[self.VARIABLES.LAYER_THICKNESS.code]
+            thickness = self._df[
+                self.VARIABLES.LAYER_THICKNESS.code
+            ].to_numpy(dtype=np.float64)
             # this works for a weighted mean, but is not assumed to be
             # the total thickness of the snowpack
-            thickness_total = thickness.sum()
-            weighted_mean = (
-                profile_average * thickness / thickness_total
-            ).sum()
+            thickness_total = np.nansum(thickness)
+            weighted_mean = np.nansum(
+                profile_average * thickness
+            ) / thickness_total
             value = weighted_mean
         else:
-            value = np.mean(profile_average)
+            value = np.nanmean(profile_average)
 
         return value
 
     @property
     def total_depth(self):
-        profile = self._df.loc[:, self._depth_layer.code].values
-        return np.nanmax(profile)
+        if self._total_depth is None:
+            profile = self._df.loc[:, self._depth_layer.code].values
+            self._total_depth = np.nanmax(profile)
+        return self._total_depth
 
     def get_profile(self, snow_datum="ground"):
         # TODO: snow datum is ground or snow
         # get profile of values
-        profile_average = self._df.loc[:, self._sample_columns].mean(
-            axis=1)
-        df = self._df.copy()
-        df[self.variable.code] = profile_average
+        df = self.df.copy()
+        df[self.variable.code] = self.layer_average
         columns_of_interest = [*self._non_measure_columns, self.variable.code]
         return df.loc[:, columns_of_interest]
 
@@ -251,6 +310,7 @@ class SnowExMetadataParser(MetaDataParser):
 class SnowExProfileData(ProfileData):
     VARIABLES = SnowExProfileVariables
     META_PARSER = SnowExMetadataParser
+    __slots__ = ()
 
     @classmethod
     def from_file(cls, fname, variable: MeasurementDescription):
@@ -258,13 +318,15 @@ class SnowExProfileData(ProfileData):
         meta_parser = cls.META_PARSER(fname, "US/Mountain")
         # Parse the metadata and column info
         metadata, columns, header_pos = meta_parser.parse()
-        # read in the actual data
-        data = cls._read(fname, columns, header_pos)
+        # read in the actual data from the lines we already have
+        data = cls._read(
+            fname, columns, header_pos, lines=meta_parser.lines
+        )
 
         return cls(data, metadata, variable)
 
     @staticmethod
-    def _read(profile_filename, columns, header_position):
+    def _read(profile_filename, columns, header_position, lines=None):
         """
         # TODO: better name mapping here
         Read in a profile file. Managing the number of lines to skip and
@@ -273,13 +335,24 @@ class SnowExProfileData(ProfileData):
         Args:
             profile_filename: Filename containing the a manually measured
                              profile
+            columns: list of column names
+            header_position: index of the column header line
+            lines: optional list of lines already read from the file. If
+                given, the file is not read again
         Returns:
             df: pd.dataframe contain csv data with standardized column names
         """
-        # header=0 because docs say to if using skip rows and columns
+        # The column header line was already parsed into columns, skip it
+        # too rather than have pandas parse it again
+        if lines is None:
+            source = profile_filename
+            skiprows = header_position + 1
+        else:
+            source = io.StringIO("".join(lines[header_position + 1:]))
+            skiprows = 0
         df = pd.read_csv(
-            profile_filename, header=0,
-            skiprows=header_position,
+            source, header=None,
+            skiprows=skiprows,
             names=columns,
             encoding='latin'
         )
@@ -324,10 +397,118 @@ class ProfileDataCollection:
     """
     This could be a collection of pits, profiles, etc
     """
+    # ProfileData class used to read files, set by subclasses
+    PROFILE_DATA_CLASS = None
+
+    def __init__(self, profiles: List[ProfileData]):
+        self._profiles = profiles
+        self._points = None
+
+        # One array per metadata field, ordered the same as profiles
+        metadata = [p.metadata for p in profiles]
+        self._ids = np.array([m.id for m in metadata], dtype=object)
+        # Pits with only a date are timezone naive, assume those are UTC
+        date_times = [pd.Timestamp(m.date_time) for m in metadata]
+        self._date_times = pd.DatetimeIndex([
+            dt.tz_localize("UTC") if dt.tzinfo is None
+            else dt.tz_convert("UTC")
+            for dt in date_times
+        ], tz="UTC")
+        self._latitudes = np.array(
+            [m.latitude for m in metadata], dtype=np.float64
+        )
+        self._longitudes = np.array(
+            [m.longitude for m in metadata], dtype=np.float64
+        )
 
-    def __init__(self, df):
-        self._df = df
-        pass
+    @property
+    def profiles(self):
+        return self._profiles
+
+    @property
+    def ids(self):
+        return self._ids
+
+    @property
+    def date_times(self):
+        return self._date_times
+
+    @property
+    def latitudes(self):
+        return self._latitudes
+
+    @property
+    def longitudes(self):
+        return self._longitudes
+
+    def in_bbox(self, minx, miny, maxx, maxy):
+        """
+        Find the profiles within a lon/lat bounding box
+
+        Returns:
+            numpy array of indices into profiles
+        """
+        in_lon = (self._longitudes >= minx) & (self._longitudes <= maxx)
+        in_lat = (self._latitudes >= miny) & (self._latitudes <= maxy)
+        return np.nonzero(in_lon & in_lat)[0]
+
+    def between(self, start, end):
+        """
+        Find the profiles measured between two datetimes (inclusive).
+        Timezone naive datetimes are assumed to be UTC
+
+        Returns:
+            numpy array of indices into profiles
+        """
+        start, end = pd.Timestamp(start), pd.Timestamp(end)
+        if start.tzinfo is None:
+            start = start.tz_localize("UTC")
+        if end.tzinfo is None:
+            end = end.tz_localize("UTC")
+        mask = (self._date_times >= start) & (self._date_times <= end)
+        return np.nonzero(mask)[0]
+
+    @property
+    def points(self):
+        """
+        GeoDataFrame with one point per profile, in the estimated UTM crs so
+        distances are in meters. The spatial index is built on first query.
+
+        A single UTM zone is picked from the center of all the points, so
+        distances are distorted for collections spanning several zones.
+        """
+        if self._points is None:
+            points = gpd.GeoDataFrame(
+                geometry=gpd.points_from_xy(
+                    self._longitudes, self._latitudes
+                ),
+                crs="EPSG:4326"
+            )
+            self._points = points.to_crs(points.estimate_utm_crs())
+        return self._points
+
+    def match_spatial(self, distance):
+        """
+        Find the profiles that are within a distance of each other
+
+        Distances are measured in the single UTM zone of self.points, so
+        they are less accurate for collections spanning several zones.
+
+        Args:
+            distance: distance in meters
+        Returns:
+            numpy array of index pairs (i, j) into profiles, where i < j
+        """
+        if len(self._profiles) == 0:
+            return np.empty((0, 2), dtype=np.intp)
+        geometry = self.points.geometry.values
+        # Buffers sit just inside the true circle, so only use their bounding
+        # boxes to find candidates and then check the exact distance
+        left, right = self.points.sindex.query(geometry.buffer(distance))
+        keep = left < right
+        left, right = left[keep], right[keep]
+        keep = geometry[left].distance(geometry[right]) <= distance
+        return np.column_stack([left[keep], right[keep]])
 
     @property
     def SWE(self):
@@ -371,9 +552,46 @@ class ProfileDataCollection:
         pass
 
     @classmethod
-    def from_files(cls):
-        # parse mlutiple files and create an iterable of ProfileData
-        pass
+    def from_files(cls, fnames, variable: MeasurementDescription,
+                   n_workers=None):
+        """
+        Parse multiple files into a collection of ProfileData. Files are
+        parsed in parallel across processes. Only subclasses that set
+        PROFILE_DATA_CLASS can read files.
+
+        Args:
+            fnames: list of file paths
+            variable: the variable to read from each file
+            n_workers: number of processes to use, defaults to the
+                number of cpus. Never more than the number of files.
+                Use 1 to parse in this process.
+        Returns:
+            ProfileDataCollection
+        """
+        if cls.PROFILE_DATA_CLASS is None:
+            raise NotImplementedError(
+                f"{cls.__name__} does not set PROFILE_DATA_CLASS, use a"
+                " subclass such as SnowExProfileDataCollection"
+            )
+        fnames = list(fnames)
+        read_file = partial(cls.PROFILE_DATA_CLASS.from_file, variable=variable)
+        n_workers = min(n_workers or os.cpu_count() or 1, len(fnames))
+        if n_workers <= 1:
+            profiles = [read_file(f) for f in fnames]
+        else:
+            # Send files to workers in batches, a few per worker, to cut
+            # down on the per task overhead for large lists of files
+            chunksize = max(1, len(fnames) // (n_workers * 4))
+            with ProcessPoolExecutor(max_workers=n_workers) as executor:
+                profiles = list(
+                    executor.map(read_file, fnames, chunksize=chunksize)
+                )
+
+        return cls(profiles)
+
+
+class SnowExProfileDataCollection(ProfileDataCollection):
+    PROFILE_DATA_CLASS = SnowExProfileData
 
 
 def standardize_depth(depths, desired_format='snow_height', is_smp=False):
@@ -392,38 +610,39 @@ def standardize_depth(depths, desired_format='snow_height', is_smp=False):
         is_smp: Boolean indicating which data this is, if smp then the data is
                 surface_datum but with positive depths
    Returns:
-        new:
+        new: Pandas series of the depths in the desired format
     """
-    max_depth = depths.max()
-    min_depth = depths.min()
-
-    new = depths.copy()
+    # Work on one copy of the depths, transformed in place
+    new = depths.to_numpy(copy=True)
+    max_depth = np.nanmax(new)
+    min_depth = np.nanmin(new)
 
     # How is the depth ordered
-    # max_depth_at_top = depths.iloc[0] > depths.iloc[-1]
+    # max_depth_at_top = new[0] > new[-1]
 
     # Is the data in surface_datum already
-    bottom_is_negative = depths.iloc[-1] < 0
+    bottom_is_negative = new[-1] < 0
 
     if desired_format == 'snow_height':
 
         if is_smp:
             LOG.info('Converting SMP depths to snow height format.')
-            new = (depths - max_depth).abs()
+            np.subtract(new, max_depth, out=new)
+            np.abs(new, out=new)
 
         elif bottom_is_negative:
             LOG.info('Converting depths in surface datum to snow height format.')
 
-            new = (depths + abs(min_depth))
+            np.add(new, abs(min_depth), out=new)
 
     elif desired_format == 'surface_datum':
         if is_smp:
             LOG.info('Converting SMP depths to surface datum format.')
-            new = depths.mul(-1)
+            np.negative(new, out=new)
 
         elif not bottom_is_negative:
             LOG.info('Converting depths in snow height to surface datum format.')
-            new = depths - max_depth
+            np.subtract(new, max_depth, out=new)
 
     else:
         raise ValueError(
@@ -431,4 +650,4 @@ def standardize_depth(depths, desired_format='snow_height', is_smp=False):
             f' {["snow_height", "surface_datum"]}'
         )
 
-    return new
+    return pd.Series(new, index=depths.index, name=depths.name)
@@ -1,7 +1,8 @@
 from dataclasses import dataclass
-from datetime import timedelta
+from functools import lru_cache
 
 import logging
+import re
 import pandas as pd
 import pytz
 import utm
@@ -12,6 +13,15 @@ from .variables import ProfileVariables
 LOG = logging.getLogger(__name__)
 
 
+@lru_cache(maxsize=None)
+def get_timezone(name):
+    """
+    pytz timezone from a name, cached since every file parse looks up
+    the same few timezones
+    """
+    return pytz.timezone(name)
+
+
 @dataclass()
 class ProfileMetaData:
     id: str
@@ -29,12 +39,16 @@ class MetaDataParser:
     Base class for parsing metadata
     """
     OUT_TIMEZONE = "UTC"
-    ID_NAMES = ["pitid", "pit_id"]
-    SITE_ID_NAMES = ["site"]
-    SITE_NAME_NAMES = ["location"]
-    LAT_NAMES = ["lat", "latitude"]
-    LON_NAMES = ["lon", "lon", "longitude"]
+    ID_NAMES = frozenset(["pitid", "pit_id"])
+    SITE_ID_NAMES = frozenset(["site"])
+    SITE_NAME_NAMES = frozenset(["location"])
+    LAT_NAMES = frozenset(["lat", "latitude"])
+    LON_NAMES = frozenset(["lon", "long", "longitude"])
     UTM_EPSG_PREFIX = "269"
+    # Zone number within a utm zone entry, e.g. 13 in 13N
+    UTM_ZONE_PATTERN = re.compile(r"\d+")
+    # Drop double quotes from header values
+    DOUBLE_QUOTES_TABLE = str.maketrans('', '', '"')
     NORTHERN_HEMISPHERE = True
     VARIABLES_CLASS = ProfileVariables
 
@@ -56,7 +70,12 @@ class MetaDataParser:
         self._input_timezone = timezone
         self._header_sep = header_sep
         self._rough_obj = {}
+        self._fields = None
         self._lat_lon_easting_northing = None
+        self._utm_epsg = None
+        # All lines of the file, kept so the data can be read without
+        # opening the file again
+        self._lines = None
 
         self._allow_split_header_lines = allow_split_lines
 
@@ -64,6 +83,51 @@ class MetaDataParser:
     def rough_obj(self):
         return self._rough_obj
 
+    @property
+    def lines(self):
+        """
+        Lines of the file, available after parsing
+        """
+        return self._lines
+
+    @classmethod
+    @lru_cache(maxsize=None)
+    def _field_lookup(cls):
+        """
+        Map of every rough_obj key we know to the metadata field it holds.
+        This is built once per class.
+        """
+        lookup = {}
+        for field, names in [
+            ("id", cls.ID_NAMES),
+            ("site_id", cls.SITE_ID_NAMES),
+            ("site_name", cls.SITE_NAME_NAMES),
+            ("latitude", cls.LAT_NAMES),
+            ("longitude", cls.LON_NAMES),
+            ("easting", ["easting"]),
+            ("northing", ["northing"]),
+            ("flags", ["flags"]),
+        ]:
+            for name in names:
+                lookup.setdefault(name, field)
+        return lookup
+
+    @property
+    def fields(self):
+        """
+        Values from the rough object by metadata field, found in one pass
+        over the rough object. The first matching key wins.
+        """
+        if self._fields is None:
+            lookup = self._field_lookup()
+            fields = {}
+            for k, v in self.rough_obj.items():
+                field = lookup.get(k)
+                if field is not None:
+                    fields.setdefault(field, v)
+            self._fields = fields
+        return self._fields
+
     @property
     def lat_lon_easting_northing(self):
         if self._lat_lon_easting_northing is None:
@@ -71,9 +135,8 @@ class MetaDataParser:
         return self._lat_lon_easting_northing
 
     def parse_id(self) -> str:
-        for k, v in self.rough_obj.items():
-            if k in self.ID_NAMES:
-                return v
+        if "id" in self.fields:
+            return self.fields["id"]
 
         raise RuntimeError(f"Failed to parse ID from {self.rough_obj}")
 
@@ -82,7 +145,7 @@ class MetaDataParser:
         Handle a separate date and time entry
 
         Args:
-            keys: list of keys
+            keys: collection of lowercase keys
             out_tz: desired timezone
         Returns:
             parsed datetime
@@ -109,27 +172,22 @@ class MetaDataParser:
 
         # Handle gpr data dates
         elif 'utcyear' in keys and 'utcdoy' in keys and 'utctod' in keys:
-            base = pd.to_datetime(
-                '{:d}-01-01 00:00:00 '.format(int(self.rough_obj['utcyear'])),
-                utc=True)
-
-            # Number of days since january 1
-            d = int(self.rough_obj['utcdoy']) - 1
+            base = pd.Timestamp(
+                f"{int(self.rough_obj['utcyear']):d}-01-01", tz="UTC"
+            )
 
             # Zulu time (time without colons)
             time = str(self.rough_obj['utctod'])
-            hr = int(time[0:2])  # hours
-            mm = int(time[2:4])  # minutes
-            ss = int(time[4:6])  # seconds
-            ms = int(
-                float('0.' + time.split('.')[-1]) * 1000)  # milliseconds
-
-            delta = timedelta(
-                days=d, hours=hr, minutes=mm, seconds=ss, milliseconds=ms
+            delta = pd.Timedelta(
+                # Number of days since january 1
+                days=int(self.rough_obj['utcdoy']) - 1,
+                hours=int(time[0:2]),
+                minutes=int(time[2:4]),
+                seconds=int(time[4:6]),
+                milliseconds=int(float('0.' + time.split('.')[-1]) * 1000)
             )
             # This is the only key set that ignores in_timezone
-            d = base.astimezone(pytz.timezone('UTC')) + delta
-            d = d.astimezone(out_tz)
+            d = (base + delta).tz_convert(out_tz)
 
         else:
             raise ValueError(
@@ -138,22 +196,22 @@ class MetaDataParser:
         return d
 
     def parse_date_time(self) -> pd.Timestamp:
-        keys = [k.lower() for k in self.rough_obj.keys()]
+        # Keys are already lowercase from StringManager.standardize_key
+        keys = self.rough_obj.keys()
         d = None
-        out_tz = pytz.timezone(self.OUT_TIMEZONE)
+        out_tz = get_timezone(self.OUT_TIMEZONE)
         # Convert timezones if it is provided
         # this variable gets rewritten later
         in_timezone = self._input_timezone
         if in_timezone is not None:
-            in_tz = pytz.timezone(in_timezone)
+            in_tz = get_timezone(in_timezone)
         # Otherwise assume incoming data is the same timezone
         else:
             raise ValueError("We did not recieve a valid in_timezone")
 
         # Look for a single header entry containing date and time.
         for k in keys:
-            kl = k.lower()
-            if 'date' in kl and 'time' in kl:
+            if 'date' in k and 'time' in k:
                 str_date = str(self.rough_obj[k].replace('T', '-'))
                 d = pd.to_datetime(str_date)
                 break
@@ -162,12 +220,14 @@ class MetaDataParser:
         if d is None:
             d = self._handle_separate_datetime(keys, out_tz)
 
-        if in_timezone is not None:
+        # Times that are already timezone aware (e.g. GPR in UTC) are only
+        # converted to the output timezone
+        if in_timezone is not None and d.tzinfo is None:
             d = d.tz_localize(in_tz)
             d = d.astimezone(out_tz)
 
         else:
-            d.replace(tzinfo=out_tz)
+            d = d.tz_convert(out_tz)
 
         self.rough_obj['date'] = d.date()
 
@@ -178,10 +238,12 @@ class MetaDataParser:
             if self.rough_obj['time'] is not None:
                 self.rough_obj['time'] = d.timetz()
 
-        dt_str = self.rough_obj["date"].isoformat()
+        # d is already the timezone aware result, only a measurement
+        # without a time is reduced to its date
         if self.rough_obj.get("time"):
-            dt_str += f"T{self.rough_obj['time'].isoformat()}"
-        dt = pd.to_datetime(dt_str)
+            dt = d
+        else:
+            dt = pd.to_datetime(self.rough_obj["date"])
 
         return dt
 
@@ -198,19 +260,14 @@ class MetaDataParser:
 
         returns lat, lon, easting, northing
         """
-        lat = None
-        lon = None
-        easting = None
-        northing = None
-        for k, v in self.rough_obj.items():
-            if k in self.LAT_NAMES:
-                lat = float(v)
-            elif k in self.LON_NAMES:
-                lon = float(v)
-            elif k == "easting":
-                easting = v
-            elif k == "northing":
-                northing = v
+        lat = self.fields.get("latitude")
+        lon = self.fields.get("longitude")
+        easting = self.fields.get("easting")
+        northing = self.fields.get("northing")
+        if lat is not None:
+            lat = float(lat)
+        if lon is not None:
+            lon = float(lon)
 
         # Do nothing first
         if lat and lon and easting and northing:
@@ -224,9 +281,17 @@ class MetaDataParser:
             # )
             pass
         elif easting and northing:
-            zone_number = self.parse_utm_epsg()[-2:]
+            zone_number = self._parse_utm_zone_number()
+            if zone_number is None:
+                # fall back to the zone at the end of the epsg
+                epsg = self.parse_utm_epsg()
+                if epsg is None:
+                    raise ValueError(
+                        f"Could not parse location from {self.rough_obj}"
+                    )
+                zone_number = int(str(epsg)[-2:])
             lat, lon = utm.to_latlon(
-                easting, northing, int(zone_number),
+                float(easting), float(northing), zone_number,
                 northern=self.NORTHERN_HEMISPHERE)
         else:
             raise ValueError(
@@ -240,39 +305,41 @@ class MetaDataParser:
     def parse_longitude(self) -> float:
         return self.lat_lon_easting_northing[1]
 
+    def _parse_utm_zone_number(self):
+        """
+        Zone number from the utm zone entry (13N -> 13), None if missing
+        """
+        utm_zone = self.rough_obj.get('utm_zone')
+        if utm_zone is None:
+            return None
+        match = self.UTM_ZONE_PATTERN.search(utm_zone)
+        return int(match.group()) if match else None
+
     def parse_utm_epsg(self) -> str:
-        info = self.rough_obj
-        epsg = None
-        if 'utm_zone' in info.keys():
-            utm_zone = int(
-                ''.join([c for c in info['utm_zone'] if c.isnumeric()]))
-            epsg = int(f"{self.UTM_EPSG_PREFIX}{utm_zone}")
-        elif 'epsg' in info.keys():
-            epsg = info["epsg"]
-        return epsg
+        if self._utm_epsg is None:
+            zone_number = self._parse_utm_zone_number()
+            if zone_number is not None:
+                self._utm_epsg = int(
+                    f"{self.UTM_EPSG_PREFIX}{zone_number:02d}"
+                )
+            else:
+                self._utm_epsg = self.rough_obj.get("epsg")
+        return self._utm_epsg
 
     def parse_site_id(self) -> str:
-        for k, v in self.rough_obj.items():
-            if k in self.SITE_ID_NAMES:
-                return v
+        if "site_id" in self.fields:
+            return self.fields["site_id"]
 
         raise RuntimeError(f"Failed to parse Site ID from {self.rough_obj}")
 
     def parse_site_name(self) -> str:
-        for k, v in self.rough_obj.items():
-            if k in self.SITE_NAME_NAMES:
-                return v
+        if "site_name" in self.fields:
+            return self.fields["site_name"]
 
         raise RuntimeError(f"Failed to parse Site Name from {self.rough_obj}")
 
     def parse_flags(self):
-        result = None
-        for k, v in self.rough_obj.items():
-            if k in ["flags"]:
-                result = v
-                break
-
-        return result
+        return self.fields.get("flags")
 
     def _preparse_meta(self, meta_lines):
         """
@@ -283,26 +350,30 @@ class MetaDataParser:
 
         # Collect key value pairs from the information above the column header
         for ln in meta_lines:
-            d = ln.split(self._header_sep)
-
             # Key is always the first entry in comma sep list
-            k = StringManager.standardize_key(d[0])
+            key, _, rest = ln.partition(self._header_sep)
+            k = StringManager.standardize_key(key)
 
             # Avoid splitting on times
             if 'time' in k or 'date' in k:
-                value = ':'.join(d[1:]).strip()
+                value = rest.replace(self._header_sep, ':').strip()
             else:
-                value = ', '.join(d[1:])
+                value = rest.replace(self._header_sep, ', ')
                 value = StringManager.clean_str(value)
 
             # Assign non empty strings to dictionary
             if k and value:
-                data[k] = value.strip(
-                    ' '
-                ).replace('"', '').replace('  ', ' ')
+                data[k] = value.strip(' ').translate(
+                    self.DOUBLE_QUOTES_TABLE
+                ).replace('  ', ' ')
 
             elif k and not value:
                 data[k] = None
+
+        LOG.debug(
+            'Discovered {} lines of valid header info.'
+            ''.format(len(data.keys()))
+        )
         return data
 
     def parse(self):
@@ -318,6 +389,10 @@ class MetaDataParser:
         """
         meta_lines, columns, header_position = self.find_header_info(self._fname)
         self._rough_obj = self._preparse_meta(meta_lines)
+        # Reset anything derived from a previous rough object
+        self._fields = None
+        self._lat_lon_easting_northing = None
+        self._utm_epsg = None
         # Create a standard metadata object
         metadata = ProfileMetaData(
             id=self.parse_id(),
@@ -332,54 +407,32 @@ class MetaDataParser:
 
         return metadata, columns, header_position
 
-    def _parse_header(self, lines):
-        # Key value pairs are separate by some separator provided.
-        data = {}
-
-        # Collect key value pairs from the information above the column header
-        for ln in lines:
-            d = ln.split(self._header_sep)
-
-            # Key is always the first entry in comma sep list
-            k = StringManager.standardize_key(d[0])
-
-            # Avoid splitting on times
-            if 'time' in k or 'date' in k:
-                value = ':'.join(d[1:]).strip()
-            else:
-                value = ', '.join(d[1:])
-                value = StringManager.clean_str(value)
-
-            # Assign non empty strings to dictionary
-            if k and value:
-                data[k] = value.strip(' ').replace('"', '').replace('  ', ' ')
-
-            elif k and not value:
-                data[k] = None
-
-        LOG.debug(
-            'Discovered {} lines of valid header info.'
-            ''.format(len(data.keys()))
-        )
-        return data
-
     def _parse_columns(self, str_line):
         """
         Parse the column names from the input line. This can include mapping
         """
+        # Copy so callers can't change the cached result
+        return list(self._parse_columns_cached(str_line))
+
+    @classmethod
+    @lru_cache(maxsize=128)
+    def _parse_columns_cached(cls, str_line):
+        """
+        Column names for a header line. Files from the same campaign share
+        header lines, so the layout is only parsed once per class and line
+        """
         # Parse the columns header based on the size of the last line
         # Remove units
-        for c in ['()', '[]']:
-            str_line = StringManager.strip_encapsulated(str_line, c)
+        str_line = StringManager.strip_units(str_line)
 
         raw_cols = str_line.strip('#').split(',')
         standard_cols = [StringManager.standardize_key(c) for c in raw_cols]
         final_cols = []
         for c in standard_cols:
-            mapped_col, col_map = self.VARIABLES_CLASS.from_mapping(c)
+            mapped_col, col_map = cls.VARIABLES_CLASS.from_mapping(c)
             final_cols.append(mapped_col)
 
-        return final_cols
+        return tuple(final_cols)
 
     def find_header_info(self, filename=None):
         """
@@ -403,6 +456,7 @@ class MetaDataParser:
         with open(filename, encoding='latin') as fp:
             lines = fp.readlines()
             fp.close()
+        self._lines = lines
 
         # Site description files have no need for column lists
         if 'site' in filename.lower():
@@ -422,32 +476,57 @@ class MetaDataParser:
             # Only parse what we know if the header
             lines = lines[0:header_pos]
 
-        final_lines = lines
-
-        # Clean up the lines from line returns to grab header info
-        final_lines = [ln.strip() for ln in final_lines]
-        # Join all data and split on header separator
-        # This handles combining split lines
-        str_data = " ".join(final_lines).split('#')
-        str_data = [ln.strip() for ln in str_data if ln]
+        str_data = list(self._iter_header_entries(lines))
 
         return str_data, columns, header_pos
 
+    @staticmethod
+    def _iter_header_entries(lines, indicator='#'):
+        """
+        Yield one header entry per segment starting with the indicator.
+        Lines without the indicator are combined with the previous entry,
+        which handles split lines.
+
+        Args:
+            lines: header lines from the file
+            indicator: character that starts a header entry
+        Returns:
+            generator of stripped, non empty header entries
+        """
+        entry = []
+        for ln in lines:
+            # Clean up the lines from line returns to grab header info
+            first, *rest = ln.strip().split(indicator)
+            entry.append(first)
+            for segment in rest:
+                combined = " ".join(entry).strip()
+                if combined:
+                    yield combined
+                entry = [segment]
+
+        combined = " ".join(entry).strip()
+        if combined:
+            yield combined
+
     def _iterative_header_pos_search(self, lines, n_columns, header_indicator):
         # Use these to monitor if a larger column count is found
         header_pos = 0
+        previous = current = None
         for i, l in enumerate(lines):
-            if i == 0:
-                previous = StringManager.get_alpha_ratio(lines[i])
-            else:
-                previous = StringManager.get_alpha_ratio(lines[i - 1])
+            # Alpha ratios are only used without a header indicator, compute
+            # each line once and carry it forward as the previous ratio
+            if not header_indicator:
+                current = StringManager.get_alpha_ratio(l)
+                if previous is None:
+                    previous = current
 
             if StringManager.line_is_header(
                 l, expected_columns=n_columns,
                 header_indicator=header_indicator,
-                previous_alpha_ratio=previous
+                previous_alpha_ratio=previous, alpha_ratio=current
             ):
                 header_pos = i
+            previous = current
 
             if i > header_pos:
                 break
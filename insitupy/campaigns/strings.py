@@ -1,14 +1,27 @@
 import logging
+import re
+from functools import lru_cache
+
 import numpy as np
 
 LOG = logging.getLogger(__name__)
 
 
 class StringManager:
-    @staticmethod
-    def clean_str(messy):
+    # Anything in parentheses or square brackets, e.g. units
+    UNITS_PATTERN = re.compile(r"\([^)]*\)|\[[^\]]*\]")
+    # Drop quotes from strings
+    QUOTES_TABLE = str.maketrans('', '', '"\'')
+    # Underscores for spaces and dashes in keys, and drop the csv byte order
+    # mark for files in utf-8 while were encoding with latin
+    KEY_TABLE = str.maketrans({' ': '_', '-': '_', 'ï': None, '»': None, '¿': None})
+
+    @classmethod
+    @lru_cache(maxsize=4096)
+    def clean_str(cls, messy):
         """
-        Removes unwanted character in a str that we encounter alot
+        Removes unwanted character in a str that we encounter alot.
+        Results are cached since the same header strings repeat across files
         """
         clean = messy
 
@@ -32,8 +45,7 @@ class StringManager:
             clean = ' '.join(result)
 
         # Remove characters anywhere in string that is undesireable
-        for ch in ['"', "'"]:
-            clean = clean.replace(ch, '')
+        clean = clean.translate(cls.QUOTES_TABLE)
 
         clean = clean.strip(' ')
         return clean
@@ -107,6 +119,19 @@ class StringManager:
         # Make sure we remove the last one
         return final
 
+    @classmethod
+    def strip_units(cls, str_line):
+        """
+        Removes anything encapsulated by () or [] from a string, same as
+        strip_encapsulated with '()' and then '[]' but in a single pass
+
+        Args:
+            str_line: String that has units we want removed
+        Returns:
+            String without anything between () or []
+        """
+        return cls.UNITS_PATTERN.sub('', str_line)
+
     @staticmethod
     def parse_none(value):
         """
@@ -132,29 +157,23 @@ class StringManager:
         return result
 
     @classmethod
+    @lru_cache(maxsize=4096)
     def standardize_key(cls, messy):
         """
         Preps a key for use in dataframe columns or dictionary. Makes everything
         lowercase, removes units, replaces spaces with underscores.
+        Results are cached since the same keys repeat across files
 
         Args:
             messy: string to be cleaned
         Returns:
             clean: String minus all characters and patterns of no interest
         """
-        key = messy
-
         # Remove units
-        for c in ['()', '[]']:
-            key = cls.strip_encapsulated(key, c)
+        key = cls.strip_units(messy)
 
         key = cls.clean_str(key)
-        key = key.lower().replace(' ', '_')
-        key = key.lower().replace('-', '_')
-
-        # This removes csv byte order mark for files in utf-8
-        # while were encoding with latin
-        key = ''.join([c for c in key if c not in 'ï»¿'])
+        key = key.lower().translate(cls.KEY_TABLE)
 
         return key
 
@@ -188,9 +207,13 @@ class StringManager:
 
     @classmethod
     def line_is_header(cls, str_line, header_sep=',', header_indicator='#',
-                       previous_alpha_ratio=None, expected_columns=None):
+                       previous_alpha_ratio=None, expected_columns=None,
+                       alpha_ratio=None):
         """
         Determine is line 1 a header line
+
+        Args:
+            alpha_ratio: optional precomputed alpha ratio of str_line
         """
         # Definitive indication of a header line
         if header_indicator:
@@ -199,7 +222,9 @@ class StringManager:
         # No immediate answer so build confidence
         matches = []
         if previous_alpha_ratio:
-            ratio = cls.get_alpha_ratio(str_line)
+            ratio = alpha_ratio
+            if ratio is None:
+                ratio = cls.get_alpha_ratio(str_line)
             matches.append(ratio >= previous_alpha_ratio)
 
         if header_sep:
@@ -1,6 +1,7 @@
 import inspect
 import logging
 from dataclasses import dataclass
+from functools import lru_cache
 from typing import List
 
 
@@ -80,6 +81,35 @@ class ExtendableVariables:
 
 
 class ProfileVariables(ExtendableVariables):
+    @classmethod
+    @lru_cache(maxsize=None)
+    def _mapping_lookup(cls):
+        """
+        Map of every name in MeasurementDescription.map_from to its
+        MeasurementDescription. This is built once per class, the first
+        entry to list a name wins.
+        """
+        lookup = {}
+        for entry in cls():
+            for name in entry.map_from or []:
+                lookup.setdefault(name, entry)
+        return lookup
+
+    @classmethod
+    def get_description(cls, input_name) -> MeasurementDescription:
+        """
+        Get the MeasurementDescription that an input name maps to
+
+        Args:
+            input_name: column or metadata name
+        Returns:
+            MeasurementDescription
+        """
+        entry = cls._mapping_lookup().get(input_name.lower())
+        if entry is None:
+            raise RuntimeError(f"Could not find mapping for {input_name}")
+        return entry
+
     @classmethod
     def from_mapping(cls, input_name):
         """
@@ -91,22 +121,16 @@ class ProfileVariables(ExtendableVariables):
             column name
             column mapping (map of name to MeasurementDescription)
         """
-        result = None
+        entry = cls.get_description(input_name)
+        # Remap to code
+        if entry.remap:
+            result = entry.code
+        else:
+            result = input_name
         # Map column name to variable type
-        column_mapping = {}
-        for entry in cls():
-            if entry.map_from and input_name.lower() in entry.map_from:
-                # Remap to code
-                if entry.remap:
-                    result = entry.code
-                else:
-                    result = input_name
-                column_mapping[result] = entry
-                break
-        if result is None:
-            raise RuntimeError(f"Could not find mapping for {input_name}")
+        column_mapping = {result: entry}
         LOG.debug(
-            f"Mapping {result} to {result} (type {column_mapping[result]})"
+            f"Mapping {input_name} to {result} (type {entry})"
         )
         return result, column_mapping
 
@@ -2,7 +2,7 @@ import pytest
 from pathlib import Path
 
 
-@pytest.fixture(scope="module")
+@pytest.fixture(scope="session")
 def data_path():
     return Path(__file__).parent.joinpath(
         "data/snowex/pits/"
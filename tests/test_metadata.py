@@ -3,29 +3,39 @@ import pytest
 
 from insitupy.campaigns.metadata import MetaDataParser
 
+# Pit date and time converted from mountain time
+PIT_DATE_TIME = pd.Timestamp("2020-04-27T14:45:00+0000")
 
-@pytest.mark.parametrize(
-    "fname", [
-        "SNEX20_TS_SP_20200427_0845_COERAP_data_density_v01.csv",
-        "SNEX20_TS_SP_20200427_0845_COERAP_data_LWC_v01.csv",
-        "SNEX20_TS_SP_20200427_0845_COERAP_data_temperature_v01.csv"
-    ]
-)
+
+# Columns we expect to pass back from each file
+PIT_COLUMNS = {
+    "SNEX20_TS_SP_20200427_0845_COERAP_data_density_v01.csv":
+        ['depth', 'bottom_depth', 'density_a', 'density_b', 'density_c'],
+    "SNEX20_TS_SP_20200427_0845_COERAP_data_LWC_v01.csv":
+        ['depth', 'bottom_depth', 'avg_density', 'permittivity_a',
+         'permittivity_b', 'lwc_vol_a', 'lwc_vol_b'],
+    "SNEX20_TS_SP_20200427_0845_COERAP_data_temperature_v01.csv":
+        ['depth', 'temperature'],
+}
+
+
+@pytest.fixture(scope="class")
+def metadata_info(fname, data_path):
+    # This is the parser object, each file is parsed once per test class
+    obj = MetaDataParser(
+        data_path.joinpath(fname), "US/Mountain"
+    )
+    metadata, columns, header_pos = obj.parse()
+    return metadata, columns, header_pos
+
+
+@pytest.mark.parametrize("fname", list(PIT_COLUMNS), scope="class")
 class TestSnowexPitMetadata:
     """
     Test that we can consistently read metadata across
     multiple pit measurements
     """
 
-    @pytest.fixture
-    def metadata_info(self, fname, data_path):
-        # This is the parser object
-        obj = MetaDataParser(
-            data_path.joinpath(fname), "US/Mountain"
-        )
-        metadata, columns, header_pos = obj.parse()
-        return metadata, columns, header_pos
-
     @pytest.fixture
     def metadata(self, metadata_info):
         return metadata_info[0]
@@ -44,10 +54,7 @@ class TestSnowexPitMetadata:
         assert metadata.id == "COERAP_20200427_0845"
 
     def test_date_time(self, metadata, fname):
-        # converted from mountain time
-        assert metadata.date_time == pd.to_datetime(
-            "2020-04-27T14:45:00+0000"
-        )
+        assert metadata.date_time == PIT_DATE_TIME
 
     def test_latitude(self, metadata, fname):
         assert metadata.latitude == 38.92524
@@ -70,24 +77,176 @@ class TestSnowexPitMetadata:
     def test_header_position(self, header_pos, fname):
         assert header_pos == 10
 
+    def test_columns(self, columns, fname):
+        """
+        Test the columns we expect to pass back from the file
+        """
+        assert columns == PIT_COLUMNS[fname]
+
+
+def test_columns_cached_copy(data_path):
+    """
+    Test the cached column layout is not changed by editing the result
+    """
+    fname = data_path.joinpath(
+        "SNEX20_TS_SP_20200427_0845_COERAP_data_temperature_v01.csv"
+    )
+    _, columns, _ = MetaDataParser(fname, "US/Mountain").parse()
+    columns.append("extra")
+    _, columns, _ = MetaDataParser(fname, "US/Mountain").parse()
+    assert columns == ['depth', 'temperature']
+
+
+def write_utm_pit(fname, location_lines):
+    """
+    Write a small pit file that only has UTM location info
+    """
+    fname.write_text(
+        "# Location,East River\n"
+        "# Site,Aspen\n"
+        "# PitID,COERAP_20200427_0845\n"
+        "# Date/Local Standard Time,2020-04-27T08:45\n"
+        f"{location_lines}"
+        "# Easting,329131\n"
+        "# Northing,4310328\n"
+        "# Depth (cm),Temperature (deg C)\n"
+        "95.0,0.0\n"
+        "85.0,0.0\n"
+    )
+
 
 @pytest.mark.parametrize(
-    "fname, expected_cols", [
-        ("SNEX20_TS_SP_20200427_0845_COERAP_data_density_v01.csv",
-         ['depth', 'bottom_depth', 'density_a', 'density_b', 'density_c']),
-        ("SNEX20_TS_SP_20200427_0845_COERAP_data_LWC_v01.csv",
-         ['depth', 'bottom_depth', 'avg_density', 'permittivity_a',
-          'permittivity_b', 'lwc_vol_a', 'lwc_vol_b']),
-        ("SNEX20_TS_SP_20200427_0845_COERAP_data_temperature_v01.csv",
-         ['depth', 'temperature'])
+    "utm_zone, expected_epsg, expected_lat, expected_lon", [
+        ("13N", 26913, 38.92524, -106.97112),
+        ("5N", 26905, 38.92524, -154.97112),
     ]
 )
-def test_columns(fname, expected_cols, data_path):
+def test_location_from_easting_northing(
+    tmp_path, utm_zone, expected_epsg, expected_lat, expected_lon
+):
     """
-    Test the columns we expect to pass back from the file
+    Test we can get the lat/lon when the file only has UTM info
     """
-    obj = MetaDataParser(
-        data_path.joinpath(fname), "US/Mountain"
+    fname = tmp_path.joinpath("pit_data_temperature.csv")
+    write_utm_pit(fname, f"# UTM Zone,{utm_zone}\n")
+    metadata, columns, header_pos = MetaDataParser(
+        fname, "US/Mountain"
+    ).parse()
+    assert metadata.utm_epsg == expected_epsg
+    assert metadata.latitude == pytest.approx(expected_lat, abs=1e-4)
+    assert metadata.longitude == pytest.approx(expected_lon, abs=1e-4)
+
+
+def test_location_missing_utm_zone(tmp_path):
+    """
+    Test easting and northing without a zone or epsg is a clear error
+    """
+    fname = tmp_path.joinpath("pit_data_temperature.csv")
+    write_utm_pit(fname, "")
+    with pytest.raises(ValueError, match="Could not parse location"):
+        MetaDataParser(fname, "US/Mountain").parse()
+
+
+def test_gpr_date_time(tmp_path):
+    """
+    Test the UTC year, day of year and time of day used by GPR data
+    """
+    fname = tmp_path.joinpath("gpr_data.csv")
+    fname.write_text(
+        "# Location,East River\n"
+        "# Site,Aspen\n"
+        "# PitID,GPR_001\n"
+        "# UTCyear,2020\n"
+        "# UTCdoy,28\n"
+        "# UTCtod,161549.557\n"
+        "# Latitude,38.92524\n"
+        "# Longitude,-106.97112\n"
+        "# Depth (cm),Density (kg/m3)\n"
+        "95.0,200.0\n"
+        "85.0,210.0\n"
     )
-    metadata, columns, header_pos = obj.parse()
-    assert columns == expected_cols
+    metadata, _, _ = MetaDataParser(fname, "US/Mountain").parse()
+    assert metadata.date_time == pd.to_datetime(
+        "2020-01-28T16:15:49.557+0000"
+    )
+
+
+def test_aware_date_time(tmp_path):
+    """
+    Test a time with its own offset is converted to UTC, ignoring the
+    input timezone
+    """
+    fname = tmp_path.joinpath("pit_data_temperature.csv")
+    fname.write_text(
+        "# Location,East River\n"
+        "# Site,Aspen\n"
+        "# PitID,COERAP_20200427_0845\n"
+        "# Date,2020-04-27\n"
+        "# Time,08:45+02:00\n"
+        "# Latitude,38.92524\n"
+        "# Longitude,-106.97112\n"
+        "# Depth (cm),Temperature (deg C)\n"
+        "95.0,0.0\n"
+        "85.0,0.0\n"
+    )
+    metadata, _, _ = MetaDataParser(fname, "US/Mountain").parse()
+    assert metadata.date_time == pd.Timestamp("2020-04-27T06:45:00+0000")
+    assert str(metadata.date_time.tz) == "UTC"
+
+
+@pytest.mark.parametrize(
+    "lines, expected", [
+        (["# Site,Aspen\n", "# PitID,COERAP\n"], ["Site,Aspen", "PitID,COERAP"]),
+        # Split lines are combined with the previous entry
+        (["# Comments,deep\n", "snow\n", "# Site,Aspen\n"],
+         ["Comments,deep snow", "Site,Aspen"]),
+        (["#\n", "\n"], []),
+    ]
+)
+def test_iter_header_entries(lines, expected):
+    assert list(MetaDataParser._iter_header_entries(lines)) == expected
+
+
+@pytest.mark.parametrize(
+    "comment_lines, expected_comment", [
+        (["on the trees"], "snow on the trees"),
+        # Entries can wrap onto many lines without the header indicator
+        (["on", "the", "trees", "and", "the", "ground"],
+         "snow on the trees and the ground"),
+    ]
+)
+def test_split_header_lines(tmp_path, comment_lines, expected_comment):
+    """
+    Test header entries split over lines are combined and the header
+    position is the last line starting with #
+    """
+    comments = "".join(f"{ln}\n" for ln in comment_lines)
+    fname = tmp_path.joinpath("pit_data_temperature.csv")
+    fname.write_text(
+        "# Location,East River\n"
+        "# Site,Aspen\n"
+        "# PitID,COERAP_20200427_0845\n"
+        "# Date/Local Standard Time,2020-04-27T08:45\n"
+        "# Latitude,38.92524\n"
+        "# Longitude,-106.97112\n"
+        f"# Comments,snow\n{comments}"
+        "# Depth (cm),Temperature (deg C)\n"
+        "95.0,0.0\n"
+        "85.0,0.0\n"
+    )
+    parser = MetaDataParser(fname, "US/Mountain", allow_split_lines=True)
+    _, columns, header_pos = parser.parse()
+    assert header_pos == 7 + len(comment_lines)
+    assert columns == ['depth', 'temperature']
+    assert parser.rough_obj["comments"] == expected_comment
+
+
+def test_field_lookup_subclass():
+    """
+    Make sure the cached field lookups are not shared between classes
+    """
+    class CustomParser(MetaDataParser):
+        ID_NAMES = frozenset(["custom_id"])
+
+    assert CustomParser._field_lookup()["custom_id"] == "id"
+    assert "custom_id" not in MetaDataParser._field_lookup()
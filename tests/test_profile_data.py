@@ -1,66 +1,231 @@
+import re
+
+import geopandas as gpd
 import numpy as np
+import pandas as pd
 import pytest
 
-from insitupy.campaigns.campaign import SnowExProfileData
+from insitupy.campaigns.campaign import ProfileDataCollection, \
+    SnowExProfileData, SnowExProfileDataCollection, standardize_depth
 from insitupy.campaigns.variables import ProfileVariables
 
 
+@pytest.fixture(scope="class")
+def profile(fname, variable, data_path):
+    # Each file and variable is read once per test class
+    return SnowExProfileData.from_file(data_path.joinpath(fname), variable)
+
+
+@pytest.mark.parametrize(
+    "fname, variable, expected", [
+        (
+            "SNEX20_TS_SP_20200427_0845_COERAP_data_temperature_v01.csv",
+            ProfileVariables.SNOW_TEMPERATURE,
+            dict(mean=0.0, total_depth=95.0)
+        ),
+        (
+            "SNEX20_TS_SP_20200427_0845_COERAP_data_LWC_v01.csv",
+            ProfileVariables.LWC,
+            dict(mean=np.nan, total_depth=95.0)
+        ),
+        (
+            "SNEX20_TS_SP_20200427_0845_COERAP_data_LWC_v01.csv",
+            ProfileVariables.PERMITTIVITY,
+            dict(mean=np.nan, total_depth=95.0)
+        ),
+        (
+            "SNEX20_TS_SP_20200427_0845_COERAP_data_density_v01.csv",
+            ProfileVariables.DENSITY,
+            dict(mean=395.037037, total_depth=95.0)
+        ),
+    ], scope="class"
+)
 class TestSnowexPitProfile:
     """
     Test the attributes of the profile
     """
 
-    @pytest.mark.parametrize(
-        "fname, variable, expected", [
-            (
-                "SNEX20_TS_SP_20200427_0845_COERAP_data_temperature_v01.csv",
-                ProfileVariables.SNOW_TEMPERATURE, 0.0
-            ),
-            (
-                "SNEX20_TS_SP_20200427_0845_COERAP_data_LWC_v01.csv",
-                ProfileVariables.LWC, np.nan
-            ),
-            (
-                "SNEX20_TS_SP_20200427_0845_COERAP_data_LWC_v01.csv",
-                ProfileVariables.PERMITTIVITY, np.nan
-            ),
-            (
-                "SNEX20_TS_SP_20200427_0845_COERAP_data_density_v01.csv",
-                ProfileVariables.DENSITY, 395.037037
-            ),
-        ]
-    )
-    def test_mean(self, fname, variable, expected, data_path):
-        file_path = data_path.joinpath(fname)
-        obj = SnowExProfileData.from_file(file_path, variable)
-        result = obj.mean
-        if np.isnan(expected):
+    def test_mean(self, profile, expected):
+        result = profile.mean
+        if np.isnan(expected["mean"]):
             assert np.isnan(result)
         else:
-            assert result == pytest.approx(expected)
-
-    @pytest.mark.parametrize(
-        "fname, variable, expected", [
-            (
-                "SNEX20_TS_SP_20200427_0845_COERAP_data_temperature_v01.csv",
-                ProfileVariables.SNOW_TEMPERATURE, 95.0
-            ),
-            (
-                "SNEX20_TS_SP_20200427_0845_COERAP_data_LWC_v01.csv",
-                ProfileVariables.LWC, 95.0
-            ),
-            (
-                "SNEX20_TS_SP_20200427_0845_COERAP_data_LWC_v01.csv",
-                ProfileVariables.PERMITTIVITY, 95.0
-            ),
-            (
-                "SNEX20_TS_SP_20200427_0845_COERAP_data_density_v01.csv",
-                ProfileVariables.DENSITY, 95.0
-            ),
-        ]
+            assert result == pytest.approx(expected["mean"])
+
+    def test_total_depth(self, profile, expected):
+        result = profile.total_depth
+        assert result == pytest.approx(expected["total_depth"])
+
+
+def test_get_profile(data_path):
+    file_path = data_path.joinpath(
+        "SNEX20_TS_SP_20200427_0845_COERAP_data_density_v01.csv"
+    )
+    obj = SnowExProfileData.from_file(file_path, ProfileVariables.DENSITY)
+    result = obj.get_profile()
+    assert isinstance(result, gpd.GeoDataFrame)
+    assert result.crs == "EPSG:4326"
+    assert list(result.columns) == [
+        "depth", "bottom_depth", "datetime", "geometry", "density"
+    ]
+    assert result["density"].iloc[0] == pytest.approx(384.333333)
+
+
+def test_no_data_keeps_integer_depths(data_path, tmp_path):
+    """
+    Test masking -9999 only changes the columns that hold it
+    """
+    source = data_path.joinpath(
+        "SNEX20_TS_SP_20200427_0845_COERAP_data_density_v01.csv"
+    ).read_text(encoding="latin")
+    fname = tmp_path.joinpath("integer_depths_data_density.csv")
+    # Integer depths, density C still holds -9999
+    fname.write_text(
+        re.sub(r"^(\d+)\.0,(\d+)\.0,", r"\1,\2,", source, flags=re.M),
+        encoding="latin"
+    )
+    df = SnowExProfileData.from_file(fname, ProfileVariables.DENSITY).df
+    assert df["depth"].dtype == np.int64
+    assert df["bottom_depth"].dtype == np.int64
+    assert df["layer_thickness"].dtype == np.int64
+    assert np.isnan(df["density_c"].iloc[2])
+
+
+@pytest.mark.parametrize(
+    "depths, desired_format, is_smp, expected", [
+        # Already in snow height
+        ([95, 85, 75], "snow_height", False, [95, 85, 75]),
+        # Surface datum to snow height
+        ([0, -10, -20], "snow_height", False, [20, 10, 0]),
+        ([0, 10, 20], "snow_height", True, [20, 10, 0]),
+        # Snow height to surface datum
+        ([95, 85, 75], "surface_datum", False, [0, -10, -20]),
+        ([0, 10, 20], "surface_datum", True, [0, -10, -20]),
+    ]
+)
+def test_standardize_depth(depths, desired_format, is_smp, expected):
+    depths = pd.Series(depths, name="depth", dtype=float)
+    result = standardize_depth(
+        depths, desired_format=desired_format, is_smp=is_smp
+    )
+    pd.testing.assert_series_equal(
+        result, pd.Series(expected, name="depth", dtype=float)
+    )
+
+
+def test_standardize_depth_bad_format():
+    with pytest.raises(ValueError):
+        standardize_depth(pd.Series([1.0, 0.0]), desired_format="bad")
+
+
+@pytest.fixture(scope="module")
+def pit_files(data_path):
+    return [
+        data_path.joinpath(
+            "SNEX20_TS_SP_20200427_0845_COERAP_data_density_v01.csv"
+        ),
+        data_path.joinpath(
+            "SNEX20_TS_SP_20200427_0845_COERAP_data_LWC_v01.csv"
+        ),
+    ]
+
+
+@pytest.fixture(scope="module")
+def collection(pit_files):
+    return SnowExProfileDataCollection.from_files(
+        pit_files, ProfileVariables.DENSITY, n_workers=1
+    )
+
+
+@pytest.mark.parametrize("n_workers", [1, 2])
+def test_collection_from_files(n_workers, pit_files):
+    collection = SnowExProfileDataCollection.from_files(
+        pit_files, ProfileVariables.DENSITY, n_workers=n_workers
+    )
+    results = [p.mean for p in collection.profiles]
+    assert len(results) == 2
+    assert results[0] == pytest.approx(395.037037)
+
+
+def test_collection_match_spatial(collection):
+    assert collection.points.crs.to_epsg() == 32613
+    result = collection.match_spatial(10.0)
+    np.testing.assert_array_equal(result, [[0, 1]])
+
+
+def test_collection_from_files_base_class(pit_files):
+    with pytest.raises(NotImplementedError):
+        ProfileDataCollection.from_files(pit_files, ProfileVariables.DENSITY)
+
+
+def test_collection_match_spatial_close_pair(pit_files, tmp_path):
+    """
+    Test a pair just closer than the distance is found, buffered points
+    sit inside the true circle so would miss it
+    """
+    source = pit_files[0].read_text(encoding="latin")
+    fnames = []
+    # 9.99 m apart in UTM 13N, at an angle between the buffer vertices
+    for i, (lat, lon) in enumerate([
+        ("38.92524420", "-106.97111576"), ("38.92525055", "-106.97100085")
+    ]):
+        fname = tmp_path.joinpath(f"pit_{i}_data_density.csv")
+        fname.write_text(
+            source.replace("38.92524", lat).replace("-106.97112", lon),
+            encoding="latin"
+        )
+        fnames.append(fname)
+    collection = SnowExProfileDataCollection.from_files(
+        fnames, ProfileVariables.DENSITY, n_workers=1
+    )
+    np.testing.assert_array_equal(collection.match_spatial(10.0), [[0, 1]])
+    assert collection.match_spatial(9.98).shape == (0, 2)
+
+
+def test_collection_match_spatial_empty():
+    result = SnowExProfileDataCollection([]).match_spatial(10.0)
+    assert result.shape == (0, 2)
+
+
+def test_collection_filters(collection):
+    assert list(collection.ids) == ["COERAP_20200427_0845"] * 2
+    np.testing.assert_array_equal(
+        collection.in_bbox(-107.0, 38.9, -106.9, 39.0), [0, 1]
+    )
+    assert len(collection.in_bbox(-106.0, 38.9, -105.0, 39.0)) == 0
+    np.testing.assert_array_equal(
+        collection.between("2020-04-27", "2020-04-28"), [0, 1]
+    )
+    assert len(collection.between("2020-04-28", "2020-04-29")) == 0
+
+
+def test_collection_date_only_pit(pit_files, tmp_path):
+    """
+    Test pits with only a date (timezone naive) mix with pits that have a
+    time, and that the date only pits are treated as UTC
+    """
+    timed = pit_files[0]
+    date_only = tmp_path.joinpath("date_only_data_density.csv")
+    date_only.write_text(
+        timed.read_text(encoding="latin").replace(
+            "# Date/Local Standard Time,2020-04-27T08:45\n",
+            "# Date,2020-04-28\n# Time,\n"
+        ),
+        encoding="latin"
+    )
+    collection = SnowExProfileDataCollection.from_files(
+        [timed, date_only], ProfileVariables.DENSITY, n_workers=1
+    )
+    assert str(collection.date_times.tz) == "UTC"
+    assert collection.date_times[1] == pd.Timestamp("2020-04-28", tz="UTC")
+    assert collection.profiles[1].df["datetime"].dtype == "datetime64[ns]"
+    np.testing.assert_array_equal(
+        collection.between("2020-04-28", "2020-04-29"), [1]
+    )
+
+    collection = SnowExProfileDataCollection.from_files(
+        [date_only], ProfileVariables.DENSITY, n_workers=1
+    )
+    np.testing.assert_array_equal(
+        collection.between("2020-04-01", "2020-05-01"), [0]
     )
-    def test_total_depth(self, fname, variable, expected, data_path):
-        file_path = data_path.joinpath(fname)
-        obj = SnowExProfileData.from_file(file_path, variable)
-        result = obj.total_depth
-        assert result == pytest.approx(expected)
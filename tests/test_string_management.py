@@ -68,6 +68,21 @@ def test_strip_encapsulated(s, encaps, expected):
     assert r == expected
 
 
+@pytest.mark.parametrize(
+    's, expected', [
+        ('Density [kg/m^3], Date [yyyymmdd]', 'Density , Date '),
+        ('Time (seconds)', 'Time '),
+        ('Temperature (deg C) [raw]', 'Temperature  '),
+        ('grain_size (mm), comments', 'grain_size , comments'),
+        ('Name', 'Name'),
+    ])
+def test_strip_units(s, expected):
+    """
+    Test we remove anything in () or [] in a single pass
+    """
+    assert StringManager.strip_units(s) == expected
+
+
 def test_parse_none():
     """
     Test we can convert nones and nans to None and still pass through everything
@@ -119,3 +134,17 @@ def test_line_is_header(
         expected_columns
     )
     assert result == expected
+
+
+@pytest.mark.parametrize("alpha_ratio, expected", [
+    # Computed from the line
+    (None, True),
+    # Precomputed ratio is used instead of the line
+    (0.1, False),
+])
+def test_line_is_header_alpha_ratio(alpha_ratio, expected):
+    result = StringManager.line_is_header(
+        "top,bottom,density", header_sep=',', header_indicator=None,
+        previous_alpha_ratio=0.5, expected_columns=3, alpha_ratio=alpha_ratio
+    )
+    assert result == expected
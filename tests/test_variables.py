@@ -1,6 +1,7 @@
 import pytest
 
-# from insitupy.campaigns.variables import ProfileVariables
+from insitupy.campaigns.variables import ProfileVariables, \
+    SnowExProfileVariables
 
 
 class TestVariables:
@@ -11,3 +12,33 @@ class TestVariables:
 
     def test_variable_list(self):
         pass
+
+
+@pytest.mark.parametrize(
+    "variables, input_name, expected_name, expected_variable", [
+        (ProfileVariables, "density_a", "density_a", ProfileVariables.DENSITY),
+        (ProfileVariables, "Top", "depth", ProfileVariables.DEPTH),
+        (SnowExProfileVariables, "pitid", "pit_id",
+         SnowExProfileVariables.PIT_ID),
+        (SnowExProfileVariables, "temperature", "temperature",
+         SnowExProfileVariables.SNOW_TEMPERATURE),
+    ]
+)
+def test_from_mapping(variables, input_name, expected_name, expected_variable):
+    name, mapping = variables.from_mapping(input_name)
+    assert name == expected_name
+    assert mapping == {expected_name: expected_variable}
+
+
+def test_from_mapping_subclass_lookup():
+    """
+    Make sure the cached lookups are not shared between classes
+    """
+    SnowExProfileVariables.from_mapping("pitid")
+    with pytest.raises(RuntimeError):
+        ProfileVariables.from_mapping("pitid")
+
+
+def test_from_mapping_missing():
+    with pytest.raises(RuntimeError):
+        ProfileVariables.from_mapping("not_a_variable")